@@ -7,6 +7,7 @@ curl localhost:8000/config -H "x-user: bob"
 """
 
 import hashlib
+from collections import OrderedDict
 from dataclasses import dataclass
 
 from fastapi import FastAPI
@@ -33,17 +34,71 @@ FLAGS: dict[str, float] = {
 }
 
 
-def in_rollout(user_id: str, flag: str, pct: float) -> bool:
-    h = hashlib.md5(f"{user_id}:{flag}".encode()).hexdigest()
-    return int(h[:8], 16) / 0xFFFFFFFF < pct
+def _signature(flag: str) -> int:
+    # Two bits of a 64-bit Bloom filter over the flag names a cached mask depends on.
+    d = hashlib.blake2b(flag.encode(), digest_size=2).digest()
+    return 1 << (d[0] & 63) | 1 << (d[1] & 63)
+
+
+def _rollouts() -> tuple[tuple[bytes, float, int], ...]:
+    return tuple((f.encode(), p, _signature(f)) for f, p in FLAGS.items())
+
+
+# (encoded flag name, pct, signature) in FLAGS order.
+_rollouts_table = _rollouts()
+
+# LRU of user id -> (rollout mask, Bloom signature of the flags it was computed from).
+_USER_MASK_CACHE: OrderedDict[str, tuple[int, int]] = OrderedDict()
+_USER_MASK_CACHE_SIZE = 8192
+
+
+def set_flag(flag: str, pct: float) -> None:
+    global _rollouts_table
+    is_new = flag not in FLAGS
+    FLAGS[flag] = pct
+    _rollouts_table = _rollouts()
+    if is_new:
+        # No cached mask has a bit for this flag yet.
+        _USER_MASK_CACHE.clear()
+        return
+    sig = _signature(flag)
+    stale = [user_id for user_id, (_, deps) in _USER_MASK_CACHE.items() if deps & sig == sig]
+    for user_id in stale:
+        del _USER_MASK_CACHE[user_id]
+
+
+def rollout_mask(user_id: str) -> tuple[int, int]:
+    # Bit i of the mask is set if the user is in the rollout of the i-th flag.
+    # Hash "<user_id>:" once and fork the state per flag instead of rehashing the prefix.
+    prefix = hashlib.blake2b(f"{user_id}:".encode(), digest_size=4)
+    mask = deps = 0
+    for bit, (flag, pct, sig) in enumerate(_rollouts_table):
+        deps |= sig
+        if pct >= 1.0:
+            mask |= 1 << bit
+        elif pct > 0.0:
+            h = prefix.copy()
+            h.update(flag)
+            if int.from_bytes(h.digest(), "big") < pct * 0xFFFFFFFF:
+                mask |= 1 << bit
+    return mask, deps
+
+
+def _cached_mask(user_id: str) -> int:
+    entry = _USER_MASK_CACHE.get(user_id)
+    if entry is not None:
+        _USER_MASK_CACHE.move_to_end(user_id)
+        return entry[0]
+    if len(_USER_MASK_CACHE) >= _USER_MASK_CACHE_SIZE:
+        _USER_MASK_CACHE.popitem(last=False)
+    entry = _USER_MASK_CACHE[user_id] = rollout_mask(user_id)
+    return entry[0]
 
 
 class FlagService:
     def flags_for(self, user: User) -> Flags:
-        return Flags(
-            new_ui=in_rollout(user.id, "new_ui", FLAGS["new_ui"]),
-            dark_mode=in_rollout(user.id, "dark_mode", FLAGS["dark_mode"]),
-        )
+        mask = _cached_mask(user.id)
+        return Flags(new_ui=bool(mask & 1), dark_mode=bool(mask & 2))
 
 
 scope = create_scope()
@@ -34,11 +34,11 @@ TENANTS = {
     "startup": Tenant("startup", "Startup Inc"),
 }
 
-PROJECTS = [
-    Project(1, "acme", "Website"),
-    Project(2, "acme", "Mobile App"),
-    Project(3, "startup", "MVP"),
-]
+PROJECTS_BY_TENANT: dict[str, list[Project]] = {
+    "acme": [Project(1, "acme", "Website"), Project(2, "acme", "Mobile App")],
+    "startup": [Project(3, "startup", "MVP")],
+}
+next_id = 4
 
 
 class TenantDB:
@@ -46,11 +46,13 @@ class TenantDB:
         self.tenant = tenant
 
     def projects(self) -> list[Project]:
-        return [p for p in PROJECTS if p.tenant_id == self.tenant.id]
+        return list(PROJECTS_BY_TENANT.get(self.tenant.id, ()))
 
     def create_project(self, name: str) -> Project:
-        p = Project(len(PROJECTS) + 1, self.tenant.id, name)
-        PROJECTS.append(p)
+        global next_id
+        p = Project(next_id, self.tenant.id, name)
+        next_id += 1
+        PROJECTS_BY_TENANT.setdefault(self.tenant.id, []).append(p)
         return p
 
 
@@ -2,76 +2,253 @@
 
 from __future__ import annotations
 
+import collections
+import contextlib
 import functools
 import inspect
 import typing
 
 import kungfu
-from nodnod import EventLoopAgent, Node, Scope, Value
+from nodnod import ConcurrentEither, EventLoopAgent, Node, Scope, SequentialEither, Value
 from starlette.requests import Request
 
 T = typing.TypeVar("T")
 F = typing.TypeVar("F", bound=typing.Callable[..., typing.Any])
 
+_Some = kungfu.Some
+_EMPTY = inspect.Parameter.empty
+_KEYWORD_ONLY = inspect.Parameter.KEYWORD_ONLY
+# FastAPI (>=0.118) unwinds this stack after the response is sent, or on failure.
+_REQUEST_EXIT_STACK = "fastapi_inner_astack"
+# Must be non-empty: Scope generates a random token for an empty detail.
+_REQUEST_DETAIL = "req"
 
-def _is_node(ann: typing.Any) -> bool:
+type Cleanup = typing.Literal["pre_response", "post_response"]
+
+
+@functools.lru_cache(maxsize=4096)
+def _is_node_cached(ann: typing.Any) -> bool:
     try:
         return isinstance(ann, type) and issubclass(ann, Node)
     except TypeError:
         return False
 
 
-async def _run_agent(agent: EventLoopAgent, scope: Scope) -> None:
-    run_method: typing.Callable[..., typing.Coroutine[typing.Any, typing.Any, None]] = (
-        getattr(agent, "run")
-    )
-    await run_method(local_scope=scope, mapped_scopes={})
+def _is_node(ann: typing.Any) -> bool:
+    try:
+        return _is_node_cached(ann)
+    except TypeError:
+        # Unhashable annotation (e.g. Annotated with unhashable metadata) is never a node.
+        return False
+
 
+type _NodeParams = dict[str, type[Node[typing.Any, typing.Any]]]
+type _ResolvedParams = tuple[tuple[str, type[typing.Any]], ...]
+
+
+# Agents are stateless between runs, so routes with the same node set share one.
+# Keyed by the node classes themselves, so a reload builds fresh agents for the new ones.
+# Bounded LRU so old node classes can be collected.
+_AGENT_CACHE: collections.OrderedDict[
+    frozenset[type[Node[typing.Any, typing.Any]]], EventLoopAgent
+] = collections.OrderedDict()
+_AGENT_CACHE_SIZE = 1024
+
+
+def _build_agent(nodes: frozenset[type[Node[typing.Any, typing.Any]]]) -> EventLoopAgent:
+    agent = _AGENT_CACHE.get(nodes)
+    if agent is not None:
+        _AGENT_CACHE.move_to_end(nodes)
+        return agent
+    agent = _AGENT_CACHE[nodes] = EventLoopAgent.build(set(nodes))
+    if len(_AGENT_CACHE) > _AGENT_CACHE_SIZE:
+        _AGENT_CACHE.popitem(last=False)
+    return agent
+
+
+def _annotations(
+    fn: typing.Callable[..., typing.Any],
+    sig: inspect.Signature,
+) -> tuple[tuple[str, typing.Any], ...]:
+    # Like get_type_hints: names in a wrapped handler live in the wrapped function's module.
+    globalns = getattr(inspect.unwrap(fn), "__globals__", {})
+    annotations: list[tuple[str, typing.Any]] = []
+    for name, param in sig.parameters.items():
+        ann = param.annotation
+        if ann is _EMPTY:
+            continue
+        if isinstance(ann, str):
+            # Only stringified annotations need evaluation; everything else is already a type.
+            ann = eval(ann, globalns, None)
+        annotations.append((name, ann))
+    return tuple(annotations)
+
+
+def _analyze(
+    fn: typing.Callable[..., typing.Any],
+    sig: inspect.Signature,
+) -> tuple[_NodeParams, EventLoopAgent | None]:
+    """Find node parameters and the agent resolving them."""
+    node_params: _NodeParams = {}
+    for name, ann in _annotations(fn, sig):
+        if typing.get_origin(ann) is typing.Annotated:
+            ann = typing.get_args(ann)[0]
+        if _is_node(ann):
+            node_params[name] = ann
+
+    agent = _build_agent(frozenset(node_params.values())) if node_params else None
+    return node_params, agent
+
+
+def _needs_request(agent: EventLoopAgent) -> bool:
+    for node in agent.traversed_nodes:
+        # Sequential either/union nodes build their later branches only at run time, so those
+        # never show up in traversed_nodes; assume any of them may inject Request.
+        if issubclass(node, (SequentialEither, ConcurrentEither)):
+            return True
+        injections = getattr(node, "__injections__", None)
+        if injections is None or Request in injections:
+            return True
+    return False
+
+
+class _ScopePool:
+    """Recycles closed per-request scopes of one route, with their Request wrappers."""
+
+    __slots__ = ("_parent", "_needs_request", "_free")
+
+    def __init__(self, parent: Scope | None, needs_request: bool, size: int = 64) -> None:
+        self._parent = parent
+        self._needs_request = needs_request
+        self._free: collections.deque[tuple[Scope, Value[typing.Any]]] = collections.deque(
+            maxlen=size
+        )
 
-async def _resolve(
+    def acquire(self, detail: str, request: Request) -> tuple[Scope, Value[typing.Any]]:
+        try:
+            scope, request_value = self._free.pop()
+        except IndexError:
+            scope = Scope(prev=self._parent, detail=detail)
+            request_value = Value(Request, request)
+        else:
+            scope.detail = detail
+            request_value.value = request
+        if self._needs_request:
+            scope.push(request_value)
+        return scope, request_value
+
+    async def recycle(self, scope: Scope, request_value: Value[typing.Any]) -> None:
+        # request_value is handed back by the caller: it isn't in the scope when unused.
+        self_value = scope[Scope]
+        try:
+            await scope.close()
+        finally:
+            # Scope.close() cleared every value; restore the entry Scope.__init__ puts in
+            # and drop the request so an idle pooled scope doesn't keep it alive.
+            scope.is_closed = False
+            scope.push(self_value)
+            request_value.value = None
+            self._free.append((scope, request_value))
+
+
+def _has_teardown(scope: Scope) -> bool:
+    return any(value.generator is not None for value in scope.values())
+
+
+async def _close_scope(
+    scope: Scope,
+    pool: _ScopePool | None,
+    request_value: Value[typing.Any] | None,
+) -> None:
+    if pool is None or request_value is None:
+        await scope.close()
+    else:
+        await pool.recycle(scope, request_value)
+
+
+def _make_endpoint(
     func: typing.Callable[..., typing.Any],
     agent: EventLoopAgent,
-    node_params: dict[str, type[Node[typing.Any, typing.Any]]],
-    request: Request,
-    kwargs: dict[str, typing.Any],
+    resolved_params: _ResolvedParams,
     parent_scope: Scope | None,
-) -> typing.Any:
-    if parent_scope is not None:
-        scope = parent_scope.create_child(detail=f"req:{id(request)}")
-    else:
-        scope = Scope(detail=f"req:{id(request)}")
-
-    async with scope:
-        scope.push(Value(Request, request))
-        await _run_agent(agent, scope)
-
-        resolved = dict(kwargs)
-        for name, node_type in node_params.items():
-            out_type: type[typing.Any] = getattr(node_type, "__type__", node_type)
-            match scope.retrieve(out_type):
-                case kungfu.Some(value):
-                    resolved[name] = value.unbox()
-                case kungfu.Nothing():
-                    pass
-
-        result = func(**resolved)
-        if inspect.iscoroutine(result):
-            return await result
+    needs_request: bool,
+    pool: _ScopePool | None,
+    post_response: bool,
+) -> typing.Callable[..., typing.Coroutine[typing.Any, typing.Any, typing.Any]]:
+    """Build the request handler for one route with its decoration-time choices baked in."""
+    run_agent: typing.Callable[..., typing.Coroutine[typing.Any, typing.Any, None]] = (
+        getattr(agent, "run")
+    )
+
+    # Always a fresh scope (child of the shared one, if any): the agent composes into the
+    # scope it is given, so running against the shared scope would leak request-local nodes.
+    def _fresh_scope(detail: str, request: Request) -> Scope:
+        scope = Scope(prev=parent_scope, detail=detail)
+        if needs_request:
+            scope.push(Value(Request, request))
+        return scope
+
+    is_coroutine = inspect.iscoroutinefunction(func)
+
+    async def endpoint(request: Request, **kwargs: typing.Any) -> typing.Any:
+        # Per-request details only help debugging; under `python -O` skip formatting one.
+        detail = f"req:{id(request)}" if __debug__ else _REQUEST_DETAIL
+        request_value: Value[typing.Any] | None = None
+        if pool is not None:
+            scope, request_value = pool.acquire(detail, request)
+        else:
+            scope = _fresh_scope(detail, request)
+        try:
+            await run_agent(local_scope=scope, mapped_scopes={})
+
+            # kwargs is this call's own **kwargs dict, so fill it in place.
+            for name, out_type in resolved_params:
+                res = scope.retrieve(out_type)
+                if isinstance(res, _Some):
+                    kwargs[name] = res.value.unbox()
+
+            result = func(**kwargs)
+            # A sync wrapper (e.g. functools.wraps around an async handler) may still return
+            # an awaitable, so only the sync path pays for the check.
+            if is_coroutine or inspect.isawaitable(result):
+                result = await result
+        except BaseException:
+            await _close_scope(scope, pool, request_value)
+            raise
+
+        if post_response and _has_teardown(scope):
+            exit_stack: contextlib.AsyncExitStack | None = request.scope.get(_REQUEST_EXIT_STACK)
+            if exit_stack is not None:
+                # Unlike BackgroundTasks this also unwinds when sending the response fails
+                # (e.g. response_model validation) or an earlier background task raises.
+                exit_stack.push_async_callback(_close_scope, scope, pool, request_value)
+                return result
+        await _close_scope(scope, pool, request_value)
         return result
 
+    return endpoint
+
 
 @typing.overload
 def nodnod_route(func: F) -> F: ...
 
 
 @typing.overload
-def nodnod_route(func: None = None, *, scope: Scope | None = None) -> typing.Callable[[F], F]: ...
+def nodnod_route(
+    func: None = None,
+    *,
+    scope: Scope | None = None,
+    pool: bool = False,
+    cleanup: Cleanup = "post_response",
+) -> typing.Callable[[F], F]: ...
 
 
 def nodnod_route(
     func: F | None = None,
     *,
     scope: Scope | None = None,
+    pool: bool = False,
+    cleanup: Cleanup = "post_response",
 ) -> F | typing.Callable[[F], F]:
     """
     Enable nodnod DI for a route.
@@ -83,35 +260,47 @@ def nodnod_route(
     @app.get("/")
     @nodnod_route(scope=app_scope.scope)
     async def handler(user: CurrentUser, config: Config): ...
+
+    pool=True reuses closed request scopes instead of allocating one per request.
+    Only safe if nothing keeps a reference to the request scope past the response.
+
+    Generator nodes are torn down after the response is sent (inline on FastAPI < 0.118).
+    Use cleanup="pre_response" when teardown must finish first (e.g. committing a transaction).
     """
 
     def decorator(fn: F) -> F:
         sig = inspect.signature(fn)
-        hints = typing.get_type_hints(fn)
+        node_params, agent = _analyze(fn, sig)
 
-        node_params: dict[str, type[Node[typing.Any, typing.Any]]] = {}
-        for name, param in sig.parameters.items():
-            ann = hints.get(name, param.annotation)
-            if ann is not inspect.Parameter.empty and _is_node(ann):
-                node_params[name] = ann
-
-        if not node_params:
+        if agent is None:
             return fn
 
-        agent = EventLoopAgent.build(set(node_params.values()))
-
-        new_params: list[inspect.Parameter] = []
-        for name, param in sig.parameters.items():
-            if name not in node_params and name != "request":
-                new_params.append(param)
-        new_params.append(
-            inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
-        )
+        new_params = [
+            param
+            for name, param in sig.parameters.items()
+            if name not in node_params and name != "request"
+        ]
+        new_params.append(inspect.Parameter("request", _KEYWORD_ONLY, annotation=Request))
         new_sig = sig.replace(parameters=new_params)
 
-        @functools.wraps(fn)
-        async def wrapper(request: Request, **kwargs: typing.Any) -> typing.Any:
-            return await _resolve(fn, agent, node_params, request, kwargs, scope)
+        resolved_params: _ResolvedParams = tuple(
+            (name, getattr(node_type, "__type__", node_type))
+            for name, node_type in node_params.items()
+        )
+        needs_request = _needs_request(agent)
+        scope_pool = _ScopePool(scope, needs_request) if pool else None
+
+        wrapper = functools.wraps(fn)(
+            _make_endpoint(
+                fn,
+                agent,
+                resolved_params,
+                scope,
+                needs_request,
+                scope_pool,
+                cleanup == "post_response",
+            )
+        )
 
         setattr(wrapper, "__signature__", new_sig)
         return typing.cast(F, wrapper)
@@ -1,9 +1,15 @@
+import functools
+import importlib
+import pathlib
+import sys
 import typing
 
-from fastapi import Depends, FastAPI, Query
+from fastapi import BackgroundTasks, Depends, FastAPI, Query
 from fastapi.testclient import TestClient
-from nodnod import scalar_node
+from nodnod import NodeError, Scope, scalar_node
+from starlette.background import BackgroundTask
 from starlette.requests import Request
+from starlette.responses import JSONResponse
 
 from fastapi_nodnod import create_scope, nodnod_route
 
@@ -75,6 +81,175 @@ class TestBasic:
 
         assert TestClient(app).get("/").json() == {"b": 20}
 
+    def test_redecorate(self) -> None:
+        def make(tag: str) -> typing.Any:
+            @scalar_node
+            class Tag:
+                @classmethod
+                def __compose__(cls) -> str:
+                    return tag
+
+            async def handler(t: Tag) -> dict[str, str]:  # type: ignore[type-arg]
+                return {"t": t}
+
+            return handler
+
+        app = FastAPI()
+        app.get("/a")(nodnod_route(make("a")))
+        app.get("/b")(nodnod_route(make("b")))
+
+        client = TestClient(app)
+        assert client.get("/a").json() == {"t": "a"}
+        assert client.get("/b").json() == {"t": "b"}
+
+    def test_node_without_request(self) -> None:
+        @scalar_node
+        class Const:
+            @classmethod
+            def __compose__(cls) -> int:
+                return 1
+
+        app = FastAPI()
+
+        @app.get("/")
+        @nodnod_route
+        async def handler(c: Const) -> dict[str, int]:  # type: ignore[type-arg]
+            return {"c": c}
+
+        assert TestClient(app).get("/").json() == {"c": 1}
+
+    def test_union_request_branch(self) -> None:
+        @scalar_node
+        class Fails:
+            @classmethod
+            def __compose__(cls) -> str:
+                raise NodeError("nope")
+
+        @scalar_node
+        class FromReq:
+            @classmethod
+            def __compose__(cls, request: Request) -> str:
+                return request.url.path
+
+        @scalar_node
+        class Pick:
+            @classmethod
+            def __compose__(cls, v: Fails | FromReq) -> str:  # type: ignore[type-arg]
+                return v  # type: ignore[return-value]
+
+        app = FastAPI()
+
+        @app.get("/x")
+        @nodnod_route
+        async def handler(p: Pick) -> dict[str, str]:  # type: ignore[type-arg]
+            return {"p": p}
+
+        assert TestClient(app).get("/x").json() == {"p": "/x"}
+
+    def test_reload(self, tmp_path: pathlib.Path, monkeypatch: typing.Any) -> None:
+        source = """
+from __future__ import annotations
+
+from fastapi import FastAPI
+from nodnod import scalar_node
+
+from fastapi_nodnod import nodnod_route
+
+
+@scalar_node
+class Greeting:
+    @classmethod
+    def __compose__(cls) -> str:
+        return "{v}"
+
+
+app = FastAPI()
+
+
+@app.get("/")
+@nodnod_route
+async def handler(g: Greeting) -> dict[str, str]:
+    return {{"g": g}}
+"""
+        module_path = tmp_path / "reloaded_app.py"
+        module_path.write_text(source.format(v="v1"))
+        monkeypatch.syspath_prepend(str(tmp_path))
+        monkeypatch.delitem(sys.modules, "reloaded_app", raising=False)
+
+        module = importlib.import_module("reloaded_app")
+        assert TestClient(module.app).get("/").json() == {"g": "v1"}
+
+        module_path.write_text(source.format(v="v2"))
+        module = importlib.reload(module)
+        assert TestClient(module.app).get("/").json() == {"g": "v2"}
+
+    def test_wrapped_string_annotations(
+        self, tmp_path: pathlib.Path, monkeypatch: typing.Any
+    ) -> None:
+        (tmp_path / "wrapping.py").write_text(
+            """
+import functools
+
+
+def passthrough(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await fn(*args, **kwargs)
+
+    return wrapper
+"""
+        )
+        (tmp_path / "wrapped_app.py").write_text(
+            """
+from __future__ import annotations
+
+from fastapi import FastAPI
+from nodnod import scalar_node
+from wrapping import passthrough
+
+from fastapi_nodnod import nodnod_route
+
+
+@scalar_node
+class Greeting:
+    @classmethod
+    def __compose__(cls) -> str:
+        return "hi"
+
+
+app = FastAPI()
+
+
+@app.get("/")
+@nodnod_route
+@passthrough
+async def handler(g: Greeting) -> dict[str, str]:
+    return {"g": g}
+"""
+        )
+        monkeypatch.syspath_prepend(str(tmp_path))
+        monkeypatch.delitem(sys.modules, "wrapped_app", raising=False)
+        monkeypatch.delitem(sys.modules, "wrapping", raising=False)
+
+        module = importlib.import_module("wrapped_app")
+        assert TestClient(module.app).get("/").json() == {"g": "hi"}
+
+    def test_annotated_node(self) -> None:
+        @scalar_node
+        class Tag:
+            @classmethod
+            def __compose__(cls) -> str:
+                return "t"
+
+        app = FastAPI()
+
+        @app.get("/")
+        @nodnod_route
+        async def handler(t: typing.Annotated[Tag, "meta"]) -> dict[str, str]:  # type: ignore[type-arg]
+            return {"t": t}
+
+        assert TestClient(app).get("/").json() == {"t": "t"}
+
 
 class TestMixed:
     def test_node_with_query(self) -> None:
@@ -216,6 +391,34 @@ class TestScope:
         assert client.get("/a").json() == {"m": "ok", "t": "A"}
         assert client.get("/b").json() == {"m": "ok", "t": "B"}
 
+    def test_pool(self) -> None:
+        counter = 0
+        scopes: list[Scope] = []
+
+        @scalar_node
+        class Counter:
+            @classmethod
+            def __compose__(cls, scope: Scope, request: Request) -> str:
+                nonlocal counter
+                counter += 1
+                scopes.append(scope)
+                return f"{request.url.path}:{counter}"
+
+        shared = create_scope()
+
+        app = FastAPI()
+
+        @app.get("/{n}")
+        @nodnod_route(scope=shared.scope, pool=True)
+        async def handler(n: int, c: Counter) -> dict[str, str]:  # type: ignore[type-arg]
+            return {"c": c}
+
+        client = TestClient(app)
+        assert client.get("/1").json() == {"c": "/1:1"}
+        assert client.get("/2").json() == {"c": "/2:2"}
+        assert scopes[0] is scopes[1]
+        assert scopes[0].prev is shared.scope
+
 
 class TestAsync:
     def test_async_compose(self) -> None:
@@ -256,3 +459,153 @@ class TestGenerator:
 
         assert TestClient(app).get("/").json() == {"r": "res"}
         assert cleaned
+
+    def test_cleanup_post_response(self) -> None:
+        events: list[str] = []
+
+        @scalar_node
+        class Res:
+            @classmethod
+            def __compose__(cls) -> typing.Generator[str, None, None]:
+                yield "res"
+                events.append("cleanup")
+
+        app = FastAPI()
+
+        @app.get("/")
+        @nodnod_route
+        async def handler(r: Res, tasks: BackgroundTasks) -> dict[str, str]:  # type: ignore[type-arg]
+            tasks.add_task(events.append, "task")
+            return {"r": r}
+
+        assert TestClient(app).get("/").json() == {"r": "res"}
+        assert events == ["task", "cleanup"]
+
+    def test_cleanup_post_response_model_error(self) -> None:
+        events: list[str] = []
+
+        @scalar_node
+        class Res:
+            @classmethod
+            def __compose__(cls) -> typing.Generator[str, None, None]:
+                yield "res"
+                events.append("cleanup")
+
+        app = FastAPI()
+
+        @app.get("/", response_model=int)
+        @nodnod_route
+        async def handler(r: Res) -> typing.Any:  # type: ignore[type-arg]
+            return {"r": r}
+
+        client = TestClient(app, raise_server_exceptions=False)
+        assert client.get("/").status_code == 500
+        assert events == ["cleanup"]
+
+    def test_cleanup_post_response_task_error(self) -> None:
+        events: list[str] = []
+
+        @scalar_node
+        class Res:
+            @classmethod
+            def __compose__(cls) -> typing.Generator[str, None, None]:
+                yield "res"
+                events.append("cleanup")
+
+        def boom() -> None:
+            raise RuntimeError("task failed")
+
+        app = FastAPI()
+
+        @app.get("/")
+        @nodnod_route
+        async def handler(r: Res, tasks: BackgroundTasks) -> dict[str, str]:  # type: ignore[type-arg]
+            tasks.add_task(boom)
+            return {"r": r}
+
+        client = TestClient(app, raise_server_exceptions=False)
+        assert client.get("/").json() == {"r": "res"}
+        assert events == ["cleanup"]
+
+    def test_cleanup_pre_response(self) -> None:
+        events: list[str] = []
+
+        @scalar_node
+        class Res:
+            @classmethod
+            def __compose__(cls) -> typing.Generator[str, None, None]:
+                yield "res"
+                events.append("cleanup")
+
+        app = FastAPI()
+
+        @app.get("/")
+        @nodnod_route(cleanup="pre_response")
+        async def handler(r: Res, tasks: BackgroundTasks) -> dict[str, str]:  # type: ignore[type-arg]
+            tasks.add_task(events.append, "task")
+            return {"r": r}
+
+        assert TestClient(app).get("/").json() == {"r": "res"}
+        assert events == ["cleanup", "task"]
+
+    def test_cleanup_with_response_background(self) -> None:
+        events: list[str] = []
+
+        @scalar_node
+        class Res:
+            @classmethod
+            def __compose__(cls) -> typing.Generator[str, None, None]:
+                yield "res"
+                events.append("cleanup")
+
+        app = FastAPI()
+
+        @app.get("/")
+        @nodnod_route
+        async def handler(r: Res) -> JSONResponse:  # type: ignore[type-arg]
+            return JSONResponse({"r": r}, background=BackgroundTask(events.append, "task"))
+
+        assert TestClient(app).get("/").json() == {"r": "res"}
+        assert events == ["task", "cleanup"]
+
+
+class TestSync:
+    def test_sync_handler(self) -> None:
+        @scalar_node
+        class Env:
+            @classmethod
+            def __compose__(cls) -> str:
+                return "prod"
+
+        app = FastAPI()
+
+        @app.get("/")
+        @nodnod_route
+        def handler(env: Env) -> dict[str, str]:  # type: ignore[type-arg]
+            return {"env": env}
+
+        assert TestClient(app).get("/").json() == {"env": "prod"}
+
+    def test_sync_wrapper_of_async_handler(self) -> None:
+        @scalar_node
+        class Env:
+            @classmethod
+            def __compose__(cls) -> str:
+                return "prod"
+
+        def sync_wrap(fn: typing.Callable[..., typing.Any]) -> typing.Callable[..., typing.Any]:
+            @functools.wraps(fn)
+            def wrapper(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+                return fn(*args, **kwargs)
+
+            return wrapper
+
+        app = FastAPI()
+
+        @app.get("/")
+        @nodnod_route
+        @sync_wrap
+        async def handler(env: Env) -> dict[str, str]:  # type: ignore[type-arg]
+            return {"env": env}
+
+        assert TestClient(app).get("/").json() == {"env": "prod"}